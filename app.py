@@ -1,81 +1,54 @@
 import os
 import streamlit as st
 import pandas as pd
+import numpy as np
 import math
 import io
 
+from erlang import traffic_intensity, prob_call_waits, service_level, occupancy, min_agents_cached, min_agents_batch
+
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+# Only the columns the Day Planner uses are read from uploaded files
+DAY_PLANNER_COLUMNS = {"Calls", "Time"}
+
+# st.cache_data is shared by every session, so bound what it keeps in memory
+CACHE_TTL_SECONDS = 3600
+
 # ----------------------------------------------------------
 # FUNCTION DEFINITIONS
 # ----------------------------------------------------------
 
-def prob_call_waits(calls, reporting_period_minutes, average_handling_time, agents):
-    """
-    Calculate the probability that a call will wait.
-    """
-    try:
-        intensity = (calls / (reporting_period_minutes * 60)) * average_handling_time
-        max_occupancy_percent = intensity / agents
-        A_n = 1.0
-        sum_A_k = 0.0
-        for k in range(agents, -1, -1):
-            A_k = A_n * k / intensity
-            sum_A_k += A_k
-            A_n = A_k
-        prob = 1 / (1 + ((1 - max_occupancy_percent) * sum_A_k))
-    except Exception:
-        prob = 1
-    return max(0, min(prob, 1))
-
-def service_level(calls, reporting_period_minutes, average_handling_time, service_level_time, agents):
+def inputs_in_range(reporting_period_minutes, average_handling_time, service_level_target, service_level_time, max_occupancy_target, shrinkage_percent):
     """
-    Calculate expected service level.
+    Check the call centre parameters are within the ranges the calculator supports.
     """
-    try:
-        intensity = (calls / (reporting_period_minutes * 60)) * average_handling_time
-        prob_wait = prob_call_waits(calls, reporting_period_minutes, average_handling_time, agents)
-        sl = 1 - (prob_wait * math.exp(-(agents - intensity) * service_level_time / average_handling_time))
-    except Exception:
-        sl = 0
-    return max(0, min(sl, 1))
-
-def occupancy(calls, reporting_period_minutes, average_handling_time, agents):
-    """
-    Calculate occupancy ratio.
-    """
-    try:
-        intensity = (calls / (reporting_period_minutes * 60)) * average_handling_time
-        occ = intensity / agents
-    except Exception:
-        occ = 0.99
-    return max(0, min(occ, 0.99))
+    return not (reporting_period_minutes < 5 or reporting_period_minutes > 1500 or
+        average_handling_time < 1 or average_handling_time > 30000 or
+        service_level_target < 0.00001 or service_level_target > 0.9998 or
+        max_occupancy_target < 0.00001 or max_occupancy_target > 0.9998 or
+        service_level_time < 1 or service_level_time > 30000 or
+        shrinkage_percent < 0 or shrinkage_percent > 0.9998)
 
 def agents_required(calls, reporting_period_minutes, average_handling_time, service_level_target, service_level_time, max_occupancy_target, shrinkage_percent):
     """
     Calculate required agents based on call centre parameters.
     """
-    # Validate input ranges
-    if (reporting_period_minutes < 5 or reporting_period_minutes > 1500 or
-        average_handling_time < 1 or average_handling_time > 30000 or
-        service_level_target < 0.00001 or service_level_target > 0.9998 or
-        max_occupancy_target < 0.00001 or max_occupancy_target > 0.9998 or
-        service_level_time < 1 or service_level_time > 30000 or
-        shrinkage_percent < 0 or shrinkage_percent > 0.9998):
+    if not inputs_in_range(reporting_period_minutes, average_handling_time, service_level_target, service_level_time, max_occupancy_target, shrinkage_percent):
         return None
 
-    intensity = (calls / (reporting_period_minutes * 60)) * average_handling_time
-    min_agents = int(intensity)
-    if min_agents < 1:
-        min_agents = 1
-
-    agents = min_agents
-
-    # Increase agents until service level meets target
-    while service_level(calls, reporting_period_minutes, average_handling_time, service_level_time, agents) < service_level_target:
-        agents += 1
-
-    # Increase agents until occupancy is within target
-    while occupancy(calls, reporting_period_minutes, average_handling_time, agents) > max_occupancy_target:
-        agents += 1
+    intensity = traffic_intensity(calls, reporting_period_minutes, average_handling_time)
+    agents = min_agents_cached(intensity, service_level_target, service_level_time, average_handling_time, max_occupancy_target)
 
     # Adjust for shrinkage
     shrinkage_percent = max(0, min(shrinkage_percent, 0.99))
@@ -89,6 +62,103 @@ def agents_required(calls, reporting_period_minutes, average_handling_time, serv
 
     return math.ceil(required)
 
+@st.cache_data(show_spinner=False, max_entries=16, ttl=CACHE_TTL_SECONDS)
+def agents_required_batch(calls_arr, reporting_period_minutes, average_handling_time, service_level_target, service_level_time, max_occupancy_target, shrinkage_percent):
+    """
+    Calculate required agents for an array of call volumes sharing the same parameters.
+    Each distinct call volume is solved once and the results are mapped back to every row.
+    Returns int32 agent counts, or nullable Int32 with <NA> for rows that cannot be solved.
+    """
+    if not inputs_in_range(reporting_period_minutes, average_handling_time, service_level_target, service_level_time, max_occupancy_target, shrinkage_percent):
+        return pd.array([pd.NA] * len(calls_arr), dtype=pd.Int32Dtype())
+
+    unique_calls, inverse = np.unique(calls_arr, return_inverse=True)
+    intensities = traffic_intensity(unique_calls, reporting_period_minutes, average_handling_time)
+    agents = min_agents_batch(intensities, service_level_target, service_level_time, average_handling_time, max_occupancy_target)
+
+    # Adjust for shrinkage
+    shrinkage_percent = max(0, min(shrinkage_percent, 0.99))
+    required = agents / (1 - shrinkage_percent)
+
+    if (required > 600).any():
+        st.warning("This calculator only works up to 600 agents. For higher numbers, please use the online version.")
+
+    results = np.ceil(required).astype(np.int32)
+    results[unique_calls == 0] = 0
+
+    # Missing or negative call volumes have no meaningful answer, so leave those rows empty
+    valid = np.isfinite(unique_calls) & (unique_calls >= 0)
+    if not valid.all():
+        st.warning("Some intervals have missing or negative call volumes; their required agents are left blank.")
+        results = pd.array(results, dtype=pd.Int32Dtype())
+        results[~valid] = pd.NA
+    return results[inverse.reshape(-1)]
+
+def compact_calls(df):
+    """
+    Store Calls as int32 when every value is a whole number, otherwise as float.
+    """
+    if "Calls" not in df.columns:
+        return df
+    calls = df["Calls"].to_numpy(dtype=np.float64, na_value=np.nan)
+    whole = np.isfinite(calls).all() and (calls == np.round(calls)).all() and (np.abs(calls) <= np.iinfo(np.int32).max).all()
+    return df.assign(Calls=calls.astype(np.int32) if whole else calls)
+
+def read_csv_upload(file):
+    """
+    Read the Day Planner columns from a CSV file.
+    """
+    # Time is echoed back exactly as uploaded rather than parsed
+    dtype = {"Time": "string"}
+    if CSV_ENGINE == "pyarrow":
+        try:
+            # The pyarrow engine does not accept a callable usecols, so filter afterwards
+            df = pd.read_csv(file, engine="pyarrow", dtype_backend="numpy_nullable", dtype=dtype)
+            return compact_calls(df[[c for c in df.columns if c in DAY_PLANNER_COLUMNS]])
+        except pd.errors.ParserError:
+            # pyarrow rejects rows with a different number of fields; the C parser pads them
+            file.seek(0)
+    df = pd.read_csv(file, engine="c", dtype_backend="numpy_nullable", dtype=dtype, usecols=lambda c: c in DAY_PLANNER_COLUMNS)
+    return compact_calls(df)
+
+def read_excel_upload(file):
+    """
+    Read the Day Planner columns from an xlsx or xlsm file.
+    """
+    df = pd.read_excel(file, engine=EXCEL_ENGINE, usecols=lambda c: c in DAY_PLANNER_COLUMNS)
+    return compact_calls(df)
+
+# Supported upload extensions and the reader for each
+READERS = {
+    ".xlsx": read_excel_upload,
+    ".xlsm": read_excel_upload,
+    ".csv": read_csv_upload,
+}
+
+@st.cache_data(show_spinner=False, max_entries=4, ttl=CACHE_TTL_SECONDS)
+def load_df(file_bytes, extension):
+    """
+    Parse the bytes of an uploaded file, cached so reruns do not parse it again.
+    """
+    return READERS[extension](io.BytesIO(file_bytes))
+
+@st.cache_data(show_spinner=False, max_entries=4, ttl=CACHE_TTL_SECONDS)
+def build_xlsx(df):
+    """
+    Write a DataFrame to xlsx bytes, cached so unchanged results are not rebuilt.
+    """
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False)
+    return buffer.getvalue()
+
+def clear_stored_upload():
+    """
+    Release the Day Planner upload bytes kept in session state.
+    """
+    st.session_state.pop("dp_file_bytes", None)
+    st.session_state.pop("dp_file_id", None)
+
 # ----------------------------------------------------------
 # STREAMLIT APP INTERFACE
 # ----------------------------------------------------------
@@ -98,6 +168,10 @@ st.title("Call Centre Helper Tools")
 # Sidebar for tool selection
 tool = st.sidebar.selectbox("Select a tool", ["Agent Calculator", "Expected Service Level", "Day Planner"])
 
+# The stored upload must not outlive the Day Planner's uploader
+if tool != "Day Planner":
+    clear_stored_upload()
+
 # -------------------------
 # AGENT CALCULATOR TOOL
 # -------------------------
@@ -136,9 +210,10 @@ elif tool == "Expected Service Level":
     agents = st.number_input("Number of Agents", min_value=1, value=10, step=1, key="esl_agents")
     
     if st.button("Calculate Service Level", key="esl_calc"):
-        sl = service_level(calls_sl, reporting_period_sl, aht_sl, service_level_time_sl, agents)
-        occ = occupancy(calls_sl, reporting_period_sl, aht_sl, agents)
-        prob_wait = prob_call_waits(calls_sl, reporting_period_sl, aht_sl, agents)
+        intensity_sl = traffic_intensity(calls_sl, reporting_period_sl, aht_sl)
+        sl = service_level(intensity_sl, aht_sl, service_level_time_sl, agents)
+        occ = occupancy(intensity_sl, agents)
+        prob_wait = prob_call_waits(intensity_sl, agents)
         st.success(f"Expected Service Level: {sl*100:.2f}%")
         st.info(f"Occupancy: {occ*100:.2f}%")
         st.info(f"Probability Call Waits: {prob_wait*100:.2f}%")
@@ -156,17 +231,22 @@ elif tool == "Day Planner":
     
     uploaded_file = st.file_uploader("Upload CSV or Excel file", type=["csv", "xlsx", "xlsm"], key="dp_upload")
     
+    if uploaded_file is None:
+        clear_stored_upload()
+
     if uploaded_file:
         filename = uploaded_file.name
         extension = os.path.splitext(filename)[1].lower()
+
+        # Read the upload once per file rather than on every rerun; file_id changes on every upload
+        if st.session_state.get("dp_file_id") != uploaded_file.file_id:
+            st.session_state["dp_file_bytes"] = uploaded_file.getvalue()
+            st.session_state["dp_file_id"] = uploaded_file.file_id
+        file_bytes = st.session_state["dp_file_bytes"]
         
         try:
-            if extension == ".xlsx":
-                df = pd.read_excel(uploaded_file, engine="openpyxl")
-            elif extension == ".xlsm":
-                df = pd.read_excel(uploaded_file, engine="openpyxl")
-            elif extension == ".csv":
-                df = pd.read_csv(uploaded_file)
+            if extension in READERS:
+                df = load_df(file_bytes, extension)
             else:
                 st.error("Please upload a valid .xlsx, .xlsm, or .csv file.")
                 st.stop()
@@ -186,20 +266,25 @@ elif tool == "Day Planner":
             shrinkage_dp = st.slider("Shrinkage (as a decimal)", min_value=0.0, max_value=1.0, value=0.17, step=0.01, key="dp_shrinkage")
             
             # Calculate required agents for each interval (each row in the file)
-            df["Required Agents"] = df["Calls"].apply(
-                lambda calls: agents_required(calls, reporting_period_dp, aht_dp, service_level_target_dp, service_level_time_dp, max_occupancy_target_dp, shrinkage_dp)
+            df["Required Agents"] = agents_required_batch(
+                df["Calls"].to_numpy(), reporting_period_dp, aht_dp, service_level_target_dp, service_level_time_dp, max_occupancy_target_dp, shrinkage_dp
             )
             
             st.subheader("Day Planner Results")
             st.dataframe(df)
             
-            # Write DataFrame to an in-memory buffer for download
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-                df.to_excel(writer, index=False)
             st.download_button(
-                label="Download Results as Excel",
-                data=buffer.getvalue(),
-                file_name="Day_Planner_Results.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                label="Download Results as CSV",
+                data=df.to_csv(index=False).encode("utf-8"),
+                file_name="Day_Planner_Results.csv",
+                mime="text/csv"
             )
+
+            # Building the Excel file is much slower than CSV, so only do it on request
+            if st.checkbox("Also build an Excel file", key="dp_xlsx"):
+                st.download_button(
+                    label="Download Results as Excel",
+                    data=build_xlsx(df),
+                    file_name="Day_Planner_Results.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
@@ -0,0 +1,143 @@
+import math
+import functools
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        # Fall back to plain Python when numba is not installed
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# ----------------------------------------------------------
+# ERLANG C CALCULATIONS
+# ----------------------------------------------------------
+
+def traffic_intensity(calls, reporting_period_minutes, average_handling_time):
+    """
+    Calculate traffic intensity in Erlangs.
+    """
+    return (calls / (reporting_period_minutes * 60)) * average_handling_time
+
+@njit(cache=True, fastmath=True)
+def _erlang_c(agents, intensity):
+    """
+    Erlang C probability of waiting for a given traffic intensity and number of agents.
+    """
+    A_n = 1.0
+    sum_A_k = 0.0
+    for k in range(agents, -1, -1):
+        A_k = A_n * k / intensity
+        sum_A_k += A_k
+        A_n = A_k
+    return 1.0 / (1.0 + ((1.0 - intensity / agents) * sum_A_k))
+
+@njit(cache=True, fastmath=True)
+def _service_level_core(agents, intensity, service_level_time, average_handling_time):
+    """
+    Service level for a given traffic intensity and number of agents.
+    """
+    if agents <= 0 or intensity <= 0.0:
+        prob_wait = 1.0
+    else:
+        prob_wait = max(0.0, min(_erlang_c(agents, intensity), 1.0))
+    return 1.0 - (prob_wait * math.exp(-(agents - intensity) * service_level_time / average_handling_time))
+
+def prob_call_waits(intensity, agents):
+    """
+    Calculate the probability that a call will wait.
+    """
+    if agents <= 0 or intensity <= 0.0:
+        return 1
+    prob = _erlang_c(agents, intensity)
+    return max(0, min(prob, 1))
+
+def service_level(intensity, average_handling_time, service_level_time, agents):
+    """
+    Calculate expected service level.
+    """
+    # Every call waits once agents <= intensity, so no call is answered within target
+    if agents <= intensity:
+        return 0
+    sl = _service_level_core(agents, intensity, service_level_time, average_handling_time)
+    return max(0, min(sl, 1))
+
+def occupancy(intensity, agents):
+    """
+    Calculate occupancy ratio.
+    """
+    if agents <= 0:
+        return 0.99
+    occ = intensity / agents
+    return max(0, min(occ, 0.99))
+
+@njit(cache=True, fastmath=True)
+def min_agents(intensity, service_level_target, service_level_time, average_handling_time, max_occupancy_target):
+    """
+    Smallest number of agents meeting both the service level and occupancy targets.
+    Erlang B is carried forward one agent at a time and Erlang C derived from it,
+    so each candidate costs O(1) instead of a full recurrence.
+    """
+    sl_time_over_aht = service_level_time / average_handling_time
+    # Service level is zero whenever agents <= intensity, so start just above it
+    agents = int(intensity) + 1
+    # Occupancy alone needs agents >= intensity / target (occupancy is capped at 0.99);
+    # start one below that bound so float rounding can never skip the true answer
+    if max_occupancy_target < 0.99:
+        agents = max(agents, math.ceil(intensity / max_occupancy_target) - 1)
+    erlang_b = 1.0
+    for n in range(1, agents + 1):
+        erlang_b = intensity * erlang_b / (n + intensity * erlang_b)
+    while True:
+        occ = intensity / agents
+        prob_wait = erlang_b / (1.0 - occ * (1.0 - erlang_b))
+        sl = 1.0 - prob_wait * math.exp(-(agents - intensity) * sl_time_over_aht)
+        if sl >= service_level_target and min(occ, 0.99) <= max_occupancy_target:
+            return agents
+        agents += 1
+        erlang_b = intensity * erlang_b / (agents + intensity * erlang_b)
+
+@functools.lru_cache(maxsize=4096)
+def min_agents_cached(intensity, service_level_target, service_level_time, average_handling_time, max_occupancy_target):
+    """
+    Memoized min_agents. This module is imported once, so the cache survives Streamlit reruns of app.py.
+    """
+    return min_agents(intensity, service_level_target, service_level_time, average_handling_time, max_occupancy_target)
+
+def min_agents_batch(intensities, service_level_target, service_level_time, average_handling_time, max_occupancy_target):
+    """
+    Vectorized min_agents over an array of traffic intensities.
+    Sweeps the agent count upwards once, updating Erlang B for every intensity at a time,
+    and records the first count at which each intensity meets both targets.
+    Intensities that are negative or not finite cannot be solved and are left at 0.
+    """
+    intensities = np.asarray(intensities, dtype=np.float64)
+    result = np.zeros(intensities.shape, dtype=np.int64)
+    pending = np.isfinite(intensities) & (intensities >= 0)
+    sl_time_over_aht = service_level_time / average_handling_time
+    erlang_b = np.ones(intensities.shape)
+    agents = 0
+    # No intensity can be met below its service level or occupancy lower bound,
+    # so only Erlang B needs carrying forward until the smallest of those bounds
+    lower_bounds = np.floor(intensities[pending]) + 1
+    if max_occupancy_target < 0.99:
+        lower_bounds = np.maximum(lower_bounds, np.ceil(intensities[pending] / max_occupancy_target) - 1)
+    first = int(lower_bounds.min()) if lower_bounds.size else 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        while agents < first - 1:
+            agents += 1
+            erlang_b = intensities * erlang_b / (agents + intensities * erlang_b)
+        while pending.any():
+            agents += 1
+            erlang_b = intensities * erlang_b / (agents + intensities * erlang_b)
+            occ = intensities / agents
+            prob_wait = erlang_b / (1.0 - occ * (1.0 - erlang_b))
+            sl = 1.0 - prob_wait * np.exp(-(agents - intensities) * sl_time_over_aht)
+            # Service level is zero whenever agents <= intensity
+            met = pending & (agents > intensities) & (sl >= service_level_target) & (np.minimum(occ, 0.99) <= max_occupancy_target)
+            result[met] = agents
+            pending &= ~met
+    return result